@@ -1,11 +1,20 @@
 """Common streaming utilities for Anthropic API."""
 
+import asyncio
+import queue
+import sys
+import threading
+import time
+from collections.abc import Callable, Mapping
+from functools import lru_cache
+from operator import itemgetter
+from types import MappingProxyType
 from typing import IO, TYPE_CHECKING, Any, Union
 
 # Runtime imports with type checking separation
 import anthropic  # noqa: E402
 import click
-from anthropic.types import MessageParam  # noqa: E402, F401
+from anthropic.types import MessageParam, TextBlockParam, Usage  # noqa: E402, F401
 
 
 # Define type aliases for better readability
@@ -13,6 +22,220 @@ if TYPE_CHECKING:
     from anthropic import Anthropic, AnthropicVertex  # noqa: F401
 
 AnthropicClient = Union["anthropic.Anthropic", "anthropic.AnthropicVertex"]
+AsyncAnthropicClient = Union[
+    "anthropic.AsyncAnthropic", "anthropic.AsyncAnthropicVertex"
+]
+
+# A sink receives each text delta both as text and as its UTF-8 encoding
+DeltaSink = Callable[[str, bytes], None]
+
+# Token usage keys reported for every stream, all starting at zero
+EMPTY_TOKEN_USAGE: dict[str, int] = {
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "cache_creation_input_tokens": 0,
+    "cache_read_input_tokens": 0,
+}
+
+# Anthropic only caches prefixes of at least 1024 tokens, so skip cache_control
+# (and its write premium) below roughly that many characters
+PROMPT_CACHE_MIN_CHARS = 4096
+
+# Price multipliers for cached input tokens, relative to regular input tokens
+CACHE_WRITE_COST_MULTIPLIER = 1.25
+CACHE_READ_COST_MULTIPLIER = 0.1
+
+# Hand buffered log output to the writer threads once 8 KiB has accumulated or
+# 25 ms have passed, so files see few large writes yet stay nearly live
+LOG_FLUSH_BYTES = 8192
+LOG_FLUSH_INTERVAL = 0.025
+
+# Maximum number of batches waiting for the log writer thread
+LOG_QUEUE_SIZE = 1024
+
+# Flush the terminal every 16 text deltas (or on newline) so output stays live
+ECHO_FLUSH_EVERY_MASK = 0xF
+
+
+class _BackgroundLogWriter:
+    """
+    Batches text deltas and writes them to the log files on a daemon thread.
+
+    Deltas collect in a local buffer that is queued by size or age; a single
+    worker thread drains the queue into every log file in order, so a disk
+    stall never holds up reading the HTTP stream. The queue is bounded, so a
+    persistently slow disk eventually applies backpressure instead of letting
+    memory grow without limit.
+    """
+
+    def __init__(self, writers: list[IO[bytes]]) -> None:
+        self._writers = writers
+        self._queue: queue.Queue[bytes | None] = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._error: Exception | None = None
+        self._pending = bytearray()
+        self._last_handoff = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write_delta(self, text: str, data: bytes) -> None:
+        """Buffer one text delta, queueing the batch when full or stale."""
+        self._pending.extend(data)
+        now = time.monotonic()
+        if (
+            len(self._pending) >= LOG_FLUSH_BYTES
+            or now - self._last_handoff >= LOG_FLUSH_INTERVAL
+        ):
+            self._queue.put(bytes(self._pending))
+            self._pending.clear()
+            self._last_handoff = now
+
+    def _run(self) -> None:
+        while (batch := self._queue.get()) is not None:
+            # After a failure keep draining, so the producer never blocks
+            if self._error is not None:
+                continue
+            try:
+                for writer in self._writers:
+                    writer.write(batch)
+                    writer.flush()
+            except Exception as e:
+                self._error = e
+
+    def close(self) -> None:
+        """Queue the remaining buffer, wait for the worker, and surface errors."""
+        if self._pending:
+            self._queue.put(bytes(self._pending))
+            self._pending.clear()
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def _terminal_sink() -> DeltaSink:
+    """
+    Build a sink that echoes deltas to stdout, flushing on newlines and every
+    few deltas. click.echo is too costly to call per token.
+    """
+    stdout_write = sys.stdout.write
+    stdout_flush = sys.stdout.flush
+    deltas = 0
+
+    def echo(text: str, data: bytes) -> None:
+        nonlocal deltas
+        deltas += 1
+        stdout_write(text)
+        if "\n" in text or deltas & ECHO_FLUSH_EVERY_MASK == 0:
+            stdout_flush()
+
+    return echo
+
+
+def _make_delta_sinks(
+    response_buf: bytearray | None,
+    echo_to_terminal: bool,
+    log_writer: _BackgroundLogWriter | None,
+) -> list[DeltaSink]:
+    """
+    Select the sinks for one stream up front, so the per-delta loop only calls
+    what is needed instead of re-checking every option for every token.
+    """
+    sinks: list[DeltaSink] = []
+    if response_buf is not None:
+        extend = response_buf.extend
+        sinks.append(lambda text, data: extend(data))
+    if echo_to_terminal:
+        sinks.append(_terminal_sink())
+    if log_writer is not None:
+        sinks.append(log_writer.write_delta)
+    return sinks
+
+
+def _build_system(
+    system_prompt: str, static_context: str
+) -> str | list[TextBlockParam]:
+    """
+    Build the system parameter: the system prompt, then any static context, as
+    separate text blocks. Each block that ends a large enough prefix is marked
+    cacheable, so repeat runs hit Anthropic's server-side prefix cache, and the
+    system prompt stays cached even when the static context changes.
+    """
+    blocks: list[TextBlockParam] = []
+    prefix_chars = 0
+    for text in (system_prompt, static_context):
+        if not text:
+            continue
+        prefix_chars += len(text)
+        block: TextBlockParam = {"type": "text", "text": text}
+        if prefix_chars >= PROMPT_CACHE_MIN_CHARS:
+            block["cache_control"] = {"type": "ephemeral"}
+        blocks.append(block)
+    return blocks or system_prompt
+
+
+@lru_cache(maxsize=8)
+def _thinking_param(budget_tokens: int) -> Mapping[str, Any]:
+    """Return a shared, read-only thinking parameter for the given budget."""
+    return MappingProxyType({"type": "enabled", "budget_tokens": budget_tokens})
+
+
+def _build_api_params(
+    prompt: str,
+    system_prompt: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    thinking_budget_tokens: int | None,
+    static_context: str,
+) -> dict[str, Any]:
+    """Build the keyword arguments for a messages.stream call."""
+    # Build the messages list
+    messages: list[MessageParam] = [{"role": "user", "content": prompt}]
+
+    # Build the parameters for the API call
+    api_params: dict[str, Any] = {
+        "model": model,
+        "system": _build_system(system_prompt, static_context),
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+    # Add thinking parameter if value is positive (for both direct and Vertex clients)
+    if thinking_budget_tokens is not None and thinking_budget_tokens > 0:
+        # Both direct Anthropic API and Vertex AI support the thinking parameter
+        api_params["thinking"] = _thinking_param(thinking_budget_tokens)
+        # When thinking is enabled, temperature must be set to 1
+        api_params["temperature"] = 1.0
+
+    return api_params
+
+
+def _record_usage(token_usage: dict[str, Any], usage: Usage) -> None:
+    """
+    Copy the final message's usage into token_usage. Usage is a typed model, so
+    read fields directly; the cache fields are optional and may be None.
+    """
+    token_usage["input_tokens"] = usage.input_tokens
+    token_usage["output_tokens"] = usage.output_tokens
+    token_usage["cache_creation_input_tokens"] = usage.cache_creation_input_tokens or 0
+    token_usage["cache_read_input_tokens"] = usage.cache_read_input_tokens or 0
+
+
+def _start_log_writer(*writers: IO[bytes] | None) -> _BackgroundLogWriter | None:
+    """Start a background writer for the log files provided, if any."""
+    provided = [writer for writer in writers if writer]
+    return _BackgroundLogWriter(provided) if provided else None
+
+
+def _finish_outputs(
+    log_writer: _BackgroundLogWriter | None, echo_to_terminal: bool
+) -> None:
+    """Drain and flush the log writers, and flush any terminal echo."""
+    if log_writer is not None:
+        log_writer.close()
+    if echo_to_terminal:
+        sys.stdout.flush()
 
 
 def stream_anthropic_response(
@@ -22,10 +245,12 @@ def stream_anthropic_response(
     model: str,
     temperature: float,
     max_tokens: int,
-    thinking_budget_tokens: int,
-    conv_log_writer: IO[str] | None = None,
-    resp_log_writer: IO[str] | None = None,
+    thinking_budget_tokens: int | None = None,
+    conv_log_writer: IO[bytes] | None = None,
+    resp_log_writer: IO[bytes] | None = None,
     echo_to_terminal: bool = True,
+    collect_response: bool = True,
+    static_context: str = "",
 ) -> tuple[str, dict[str, Any]]:
     """
     Streams the Anthropic API response using the provided client.
@@ -37,120 +262,153 @@ def stream_anthropic_response(
         model: Model name to use
         temperature: Temperature for generation
         max_tokens: Maximum tokens in the response
-        thinking_budget_tokens: Budget for thinking tokens in extended thinking mode
-        conv_log_writer: File writer for conversation log (optional)
-        resp_log_writer: File writer for response log (optional)
+        thinking_budget_tokens: Budget for thinking tokens in extended thinking mode;
+            None or a non-positive value disables thinking
+        conv_log_writer: Binary file writer for conversation log (optional)
+        resp_log_writer: Binary file writer for response log (optional)
         echo_to_terminal: Whether to echo response to terminal
+        collect_response: Whether to build the response text in memory; when
+            False, the returned response_text is empty
+        static_context: Static text (e.g. reference material) sent as a
+            cacheable system block after the system prompt
 
     Returns:
         Tuple of (response_text, token_usage_dict)
     """
-    # Build the messages list
-    messages: list[MessageParam] = [{"role": "user", "content": prompt}]
-
-    # Build the parameters for the API call
-    api_params: dict[str, Any] = {
-        "model": model,
-        "system": system_prompt,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-    }
-
-    # Add thinking parameter if value is positive (for both direct and Vertex clients)
-    if thinking_budget_tokens > 0:
-        # Both direct Anthropic API and Vertex AI support the thinking parameter
-        api_params["thinking"] = {
-            "type": "enabled",
-            "budget_tokens": thinking_budget_tokens,
-        }
-        # When thinking is enabled, temperature must be set to 1
-        api_params["temperature"] = 1.0
+    api_params = _build_api_params(
+        prompt,
+        system_prompt,
+        model,
+        temperature,
+        max_tokens,
+        thinking_budget_tokens,
+        static_context,
+    )
 
     # Initialize token usage tracking and text collection
-    token_usage: dict[str, Any] = {}
-    text_chunks: list[str] = []
+    token_usage: dict[str, Any] = dict(EMPTY_TOKEN_USAGE)
+    # A single growing byte buffer avoids one str object per delta
+    response_buf = bytearray()
+    log_writer = _start_log_writer(resp_log_writer, conv_log_writer)
+    sinks = _make_delta_sinks(
+        response_buf if collect_response else None, echo_to_terminal, log_writer
+    )
 
     try:
         # Use the stream context manager
         with client.messages.stream(**api_params) as stream:
-            # Process events
-            for event in stream:
-                # Capture token usage from message_start event
-                if event.type == "message_start" and hasattr(event, "message"):
-                    if hasattr(event.message, "usage"):
-                        usage = event.message.usage
-                        token_usage.update(
-                            {
-                                "input_tokens": getattr(usage, "input_tokens", 0),
-                                "output_tokens": getattr(usage, "output_tokens", 0),
-                                "cache_creation_input_tokens": getattr(
-                                    usage, "cache_creation_input_tokens", 0
-                                ),
-                                "cache_read_input_tokens": getattr(
-                                    usage, "cache_read_input_tokens", 0
-                                ),
-                            }
-                        )
-
-                # Update token usage from message_delta event (cumulative)
-                elif event.type == "message_delta" and hasattr(event, "usage"):
-                    delta_usage = event.usage
-                    token_usage.update(
-                        {
-                            "output_tokens": getattr(
-                                delta_usage,
-                                "output_tokens",
-                                token_usage.get("output_tokens", 0),
-                            ),
-                        }
-                    )
-
-                # Process text content
-                elif event.type == "content_block_delta":
-                    delta = event.delta
-                    if delta.type == "text_delta":
-                        text = delta.text
-
-                        # Collect text chunks
-                        text_chunks.append(text)
-
-                        # Echo to terminal if requested
-                        if echo_to_terminal:
-                            click.echo(text, nl=False)
-
-                        # Write to response log file
-                        if resp_log_writer:
-                            resp_log_writer.write(text)
-                            resp_log_writer.flush()
-
-                        # Write to conversation log file
-                        if conv_log_writer:
-                            conv_log_writer.write(text)
-                            conv_log_writer.flush()
+            # text_stream yields only text deltas, leaving event dispatch to the SDK
+            for text in stream.text_stream:
+                # Encode once; the buffer and both log files share the bytes
+                data = text.encode("utf-8")
+                for sink in sinks:
+                    sink(text, data)
+
+            # The SDK accumulates the final message, including cumulative usage
+            _record_usage(token_usage, stream.get_final_message().usage)
 
     except Exception as e:
         # Re-raise with more context
         raise RuntimeError(f"Anthropic API stream failed: {e}") from e
+    finally:
+        _finish_outputs(log_writer, echo_to_terminal)
 
-    response_text = "".join(text_chunks)
+    response_text = response_buf.decode("utf-8")
     return response_text, token_usage
 
 
-def print_token_usage(token_usage: dict[str, Any]) -> None:
-    """Print token usage information in a consistent format."""
-    click.echo("\n\n--- Token Usage ---")
-    click.echo(f"Input tokens: {token_usage.get('input_tokens', 0)}")
-    click.echo(f"Output tokens: {token_usage.get('output_tokens', 0)}")
-    click.echo(
-        f"Cache creation tokens: {token_usage.get('cache_creation_input_tokens', 0)}"
+async def stream_anthropic_response_async(
+    client: AsyncAnthropicClient,
+    prompt: str,
+    system_prompt: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    thinking_budget_tokens: int | None = None,
+    conv_log_writer: IO[bytes] | None = None,
+    resp_log_writer: IO[bytes] | None = None,
+    echo_to_terminal: bool = True,
+    collect_response: bool = True,
+    static_context: str = "",
+) -> tuple[str, dict[str, Any]]:
+    """
+    Async counterpart of stream_anthropic_response for AsyncAnthropic and
+    AsyncAnthropicVertex clients. The log writes run on background threads, so
+    they overlap with waiting on the network for the next chunk.
+
+    Takes the same arguments and returns the same tuple as
+    stream_anthropic_response.
+    """
+    api_params = _build_api_params(
+        prompt,
+        system_prompt,
+        model,
+        temperature,
+        max_tokens,
+        thinking_budget_tokens,
+        static_context,
+    )
+
+    token_usage: dict[str, Any] = dict(EMPTY_TOKEN_USAGE)
+    response_buf = bytearray()
+    log_writer = _start_log_writer(resp_log_writer, conv_log_writer)
+    sinks = _make_delta_sinks(
+        response_buf if collect_response else None, echo_to_terminal, log_writer
+    )
+
+    try:
+        async with client.messages.stream(**api_params) as stream:
+            async for text in stream.text_stream:
+                data = text.encode("utf-8")
+                for sink in sinks:
+                    sink(text, data)
+
+            _record_usage(token_usage, (await stream.get_final_message()).usage)
+
+    except Exception as e:
+        raise RuntimeError(f"Anthropic API stream failed: {e}") from e
+    finally:
+        # Draining the writer threads blocks, so keep it off the event loop
+        await asyncio.to_thread(_finish_outputs, log_writer, echo_to_terminal)
+
+    return response_buf.decode("utf-8"), token_usage
+
+
+_usage_fields = itemgetter(
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+def print_token_usage(token_usage: dict[str, Any], label: str | None = None) -> None:
+    """
+    Print token usage information in a consistent format, with label (such as
+    the prompt file) in the heading when given.
+    """
+    input_tokens, output_tokens, cache_creation, cache_read = _usage_fields(
+        {**EMPTY_TOKEN_USAGE, **token_usage}
     )
-    click.echo(f"Cache read tokens: {token_usage.get('cache_read_input_tokens', 0)}")
-    total_input = (
-        token_usage.get("input_tokens", 0)
-        + token_usage.get("cache_creation_input_tokens", 0)
-        + token_usage.get("cache_read_input_tokens", 0)
+    total_input = input_tokens + cache_creation + cache_read
+    # Input cost in units of uncached input tokens, to show the cache's effect
+    effective_input = (
+        input_tokens
+        + CACHE_WRITE_COST_MULTIPLIER * cache_creation
+        + CACHE_READ_COST_MULTIPLIER * cache_read
     )
-    click.echo(f"Total input tokens: {total_input}")
-    click.echo(f"Total tokens: {total_input + token_usage.get('output_tokens', 0)}")
-    click.echo("-------------------\n")
+    lines = [
+        f"\n\n--- Token Usage: {label} ---" if label else "\n\n--- Token Usage ---",
+        f"Input tokens: {input_tokens}",
+        f"Output tokens: {output_tokens}",
+        f"Cache creation tokens: {cache_creation}",
+        f"Cache read tokens: {cache_read}",
+        f"Total input tokens: {total_input}",
+        f"Total tokens: {total_input + output_tokens}",
+        f"Cost-equivalent input tokens: {effective_input:.0f}",
+    ]
+    if total_input:
+        lines.append(f"Cache hit rate: {cache_read / total_input:.0%}")
+    lines.append("-------------------\n")
+    # One write, so concurrent runs can't interleave their usage blocks
+    click.echo("\n".join(lines))
@@ -1,11 +1,16 @@
-import os
-import sys
-from datetime import datetime
+from functools import lru_cache
 
 import click
 from anthropic import Anthropic
 
 from anthropic_common.streaming import print_token_usage, stream_anthropic_response
+from common_cli.runner import LogFiles, PromptParts, require_env, run
+
+
+@lru_cache(maxsize=1)
+def _get_client() -> Anthropic:
+    """Return a process-wide Anthropic client so its connection pool is reused."""
+    return Anthropic()
 
 
 @click.command()
@@ -61,73 +66,30 @@ def main(
     --system-prompt-file) to query the Claude API via the Anthropic SDK,
     streaming the response to log files.
     """
-    # Read the main prompt
-    try:
-        with open(prompt_file, encoding="utf-8") as f:
-            prompt = f.read()
-    except OSError as exc:
-        click.echo(f"Error reading prompt file: {exc}", err=True)
-        sys.exit(1)
-
-    # Read the system prompt
-    try:
-        with open(system_prompt_file, encoding="utf-8") as f:
-            system_prompt = f.read()
-    except OSError as exc:
-        click.echo(f"Error reading system prompt file: {exc}", err=True)
-        sys.exit(1)
-
-    # Prepare for logging
-    os.makedirs("log", exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    base_name = os.path.splitext(os.path.basename(prompt_file))[0]
-    conversation_path = os.path.join("log", f"{base_name}_conversation")
-    response_path = os.path.join("log", f"{base_name}_claude_response_{timestamp}")
-
-    try:
-        # Open files for writing/appending *before* the API call
-        with (
-            open(conversation_path, "a", encoding="utf-8") as conv_f,
-            open(response_path, "w", encoding="utf-8") as resp_f,
-        ):
-            # Log the prompt part to the conversation file
-            conv_f.write(f"--- Prompt: {timestamp} ---\n")
-            conv_f.write(f"{prompt}\n")
-            conv_f.write(f"--- Response: {timestamp} ---\n")
-            conv_f.flush()  # Ensure prompt is written before response starts
-
-            # Create Anthropic client
-            client = Anthropic()
-
-            # Call the streaming API and process the stream
-            response_text, token_usage = stream_anthropic_response(
-                client=client,
-                prompt=prompt,
-                system_prompt=system_prompt,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                thinking_budget_tokens=thinking_budget_tokens,
-                conv_log_writer=conv_f,
-                resp_log_writer=resp_f,
-                echo_to_terminal=False,  # We'll handle terminal output ourselves
-            )
+    require_env("ANTHROPIC_API_KEY")
 
+    def send(parts: PromptParts, logs: LogFiles) -> None:
+        # Stream straight into the log files through the shared client
+        _, token_usage = stream_anthropic_response(
+            client=_get_client(),
+            prompt=parts.user_prompt,
+            system_prompt=parts.system_prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            thinking_budget_tokens=thinking_budget_tokens,
+            conv_log_writer=logs.conversation,
+            resp_log_writer=logs.response,
+            echo_to_terminal=False,  # We'll handle terminal output ourselves
+            collect_response=False,  # Already streamed to the response file
+            static_context=parts.static_context,
+        )
         click.echo("\nResponse stream finished.")  # Add a newline after streaming
 
         # Print token usage information
         print_token_usage(token_usage)
 
-        click.echo(f"Conversation appended to {conversation_path}")
-        click.echo(f"Response written to {response_path}")
-
-    except OSError as exc:
-        click.echo(f"Error opening or writing log files: {exc}", err=True)
-        sys.exit(1)
-    except Exception as exc:
-        # Catch potential API errors raised from stream_anthropic_response
-        click.echo(f"\nError during API call or streaming: {exc}", err=True)
-        sys.exit(1)
+    run(send, "claude", "Claude", prompt_file, system_prompt_file)
 
 
 if __name__ == "__main__":
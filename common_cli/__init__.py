@@ -0,0 +1 @@
+"""Common utilities shared by the CLI modules."""
@@ -0,0 +1,130 @@
+"""An on-disk cache of model responses for repeated, deterministic requests."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections.abc import Awaitable, Callable
+from functools import lru_cache
+from typing import Any
+
+
+# Directory, relative to the working directory, that holds the cache database
+DEFAULT_CACHE_DIR = ".llm_cache"
+
+# How long a cached response stays valid, in seconds
+CACHE_TTL = 86400
+
+
+@lru_cache(maxsize=16)
+def _text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class LLMCache:
+    """
+    Responses keyed by a hash of everything that determines them, stored in a
+    SQLite database so they survive across CLI invocations.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "responses.sqlite3"))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def key(request: dict[str, Any]) -> str:
+        """
+        Hash a request's parameters into a cache key. The system prompt is
+        usually large and shared by every call, so it enters the key as a
+        digest computed once per distinct text.
+        """
+        if "system_prompt" in request:
+            request = {
+                **request,
+                "system_prompt": _text_digest(request["system_prompt"]),
+            }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response for key, or None if absent or expired."""
+        row = self._db.execute(
+            "SELECT response FROM responses WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, response: str, ttl: float = CACHE_TTL) -> None:
+        """Store a response under key for ttl seconds."""
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, response, time.time() + ttl),
+            )
+
+
+def open_cache(cache_dir: str, no_cache: bool, temperature: float) -> LLMCache | None:
+    """
+    Return the response cache for a run, or None when it would never be used,
+    so runs that can't hit the cache don't create its database.
+
+    Only requests at temperature 0 are cached: at higher temperatures a repeat
+    run is expected to sample a different response.
+    """
+    if no_cache or temperature != 0:
+        return None
+    return LLMCache(cache_dir)
+
+
+def cached_call(
+    cache: LLMCache | None,
+    request: dict[str, Any],
+    fetch: Callable[[], str],
+    replay: Callable[[str], None] | None = None,
+) -> str:
+    """
+    Return the cached response for request, or call fetch and cache its result.
+    Without a cache (see open_cache), fetch is always called. Empty responses,
+    such as a blocked or truncated generation, aren't stored, so they aren't
+    replayed in place of a retry.
+
+    A caller whose fetch streams its output can pass that stream's callback as
+    replay; a cache hit is passed to it, so the caller sees the text either way.
+    """
+    if cache is None:
+        return fetch()
+
+    key = LLMCache.key(request)
+    response = cache.get(key)
+    if response is None:
+        response = fetch()
+        if response:
+            cache.set(key, response)
+    elif replay is not None:
+        replay(response)
+    return response
+
+
+async def cached_call_async(
+    cache: LLMCache | None,
+    request: dict[str, Any],
+    fetch: Callable[[], Awaitable[str]],
+    replay: Callable[[str], None] | None = None,
+) -> str:
+    """Async variant of cached_call, for a fetch that is a coroutine function."""
+    if cache is None:
+        return await fetch()
+
+    key = LLMCache.key(request)
+    response = cache.get(key)
+    if response is None:
+        response = await fetch()
+        if response:
+            cache.set(key, response)
+    elif replay is not None:
+        replay(response)
+    return response
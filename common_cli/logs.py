@@ -0,0 +1,24 @@
+"""Common log-file utilities for the CLIs."""
+
+import os
+from typing import BinaryIO
+
+
+# Buffer size for log files; well above the 8 KiB default, so small writes
+# coalesce into few large write() syscalls
+LOG_BUFFER_SIZE = 131072
+
+# Directory, relative to the working directory, that the CLIs write logs to
+LOG_DIR = "log"
+
+
+def open_append_log(path: str) -> BinaryIO:
+    """
+    Open a log file for buffered binary appends, creating it if needed.
+
+    Every write() lands at the end of the file (O_APPEND), so parallel runs
+    sharing a conversation log interleave whole flushed batches rather than
+    overwriting each other, and the descriptor isn't leaked to subprocesses.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+    return os.fdopen(fd, "ab", buffering=LOG_BUFFER_SIZE)
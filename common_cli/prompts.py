@@ -0,0 +1,75 @@
+"""Common prompt-file utilities for the CLIs."""
+
+import mmap
+import os
+import re
+from functools import lru_cache
+
+
+# A line consisting of this sentinel separates static context (instructions,
+# schemas, reference material) from the user turn in a prompt file
+USER_SENTINEL = "--- USER ---"
+
+# Prompt files at least this large are read through a memory map
+MMAP_MIN_BYTES = 262144
+
+_USER_SENTINEL_RE = re.compile(rf"^{re.escape(USER_SENTINEL)}[ \t]*(?:\n|$)", re.M)
+
+
+def split_prompt(prompt: str) -> tuple[str, str]:
+    """
+    Split prompt-file text into (static_context, user_prompt) at the first
+    USER_SENTINEL line.
+
+    Providers cache prompt prefixes, so static context belongs with the system
+    prompt, ahead of the part that changes from run to run. Text without the
+    sentinel is returned as the user prompt with empty static context.
+    """
+    match = _USER_SENTINEL_RE.search(prompt)
+    if match is None:
+        return "", prompt
+    return prompt[: match.start()].rstrip("\n"), prompt[match.end() :]
+
+
+def join_system_prompt(system_prompt: str, static_context: str) -> str:
+    """Append static context to the system prompt, keeping static text first."""
+    if not static_context:
+        return system_prompt
+    return f"{system_prompt}\n\n{static_context}"
+
+
+def read_prompt_bytes(path: str) -> bytes:
+    """
+    Read a prompt file's bytes. Large files are mapped and copied out in one
+    pass, with the kernel told to read ahead sequentially.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_BYTES:
+            return f.read()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            return mm[:]
+
+
+def decode_prompt(data: bytes) -> str:
+    """
+    Decode prompt-file bytes as UTF-8 with universal newlines, as text-mode
+    open() would, so CRLF files send and split the same as LF ones.
+    """
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+@lru_cache(maxsize=8)
+def _read_text_cached(path: str, mtime_ns: int) -> str:
+    return decode_prompt(read_prompt_bytes(path))
+
+
+def read_system_prompt(path: str) -> str:
+    """
+    Read a system prompt file, reusing the cached text while the file's
+    modification time is unchanged. Paths are resolved first, so different
+    spellings of the same file share one cached copy.
+    """
+    path = os.path.realpath(path)
+    return _read_text_cached(path, os.stat(path).st_mtime_ns)
@@ -0,0 +1,280 @@
+"""The prompt-file-to-log-file flow shared by the CLIs."""
+
+import asyncio
+import io
+import os
+import sys
+import time
+from collections.abc import Awaitable, Callable, Iterator, Sequence
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import IO, BinaryIO, NamedTuple
+
+import click
+
+from common_cli.logs import LOG_BUFFER_SIZE, LOG_DIR, open_append_log
+from common_cli.prompts import (
+    decode_prompt,
+    read_prompt_bytes,
+    read_system_prompt,
+    split_prompt,
+)
+
+
+class PromptParts(NamedTuple):
+    """The system prompt and a prompt file, split at its user sentinel."""
+
+    system_prompt: str
+    static_context: str
+    user_prompt: str
+    prompt_file: str
+
+
+class LogFiles(NamedTuple):
+    """The binary log files a response is written to."""
+
+    conversation: IO[bytes]
+    response: IO[bytes]
+
+
+# Sends the prompt and returns the response text for the runner to log and
+# echo, or None when the provider already streamed it into the log files
+Provider = Callable[[PromptParts, LogFiles], str | None]
+AsyncProvider = Callable[[PromptParts, LogFiles], Awaitable[str | None]]
+
+
+def require_env(name: str) -> None:
+    """Exit with status 2 before any other work if an environment variable is unset."""
+    if not os.environ.get(name):
+        click.echo(f"Error: {name} environment variable not set.", err=True)
+        sys.exit(2)
+
+
+def stream_to_logs(logs: LogFiles, echo_to_terminal: bool) -> Callable[[str], None]:
+    """
+    Return a callback for providers that stream: it appends each text chunk to
+    both log files and, optionally, echoes it to the terminal.
+    """
+
+    def write(text: str) -> None:
+        data = text.encode()
+        logs.conversation.write(data)
+        logs.response.write(data)
+        if echo_to_terminal:
+            click.echo(text, nl=False)
+
+    return write
+
+
+def _prompt_parts(
+    system_prompt: str, prompt_file: str, prompt_bytes: bytes
+) -> PromptParts:
+    # Static context before the user sentinel joins the cached system prefix
+    static_context, user_prompt = split_prompt(decode_prompt(prompt_bytes))
+    return PromptParts(system_prompt, static_context, user_prompt, prompt_file)
+
+
+def _log_paths(
+    provider_name: str, prompt_file: str, timestamp: str, suffix: str = ""
+) -> tuple[str, str]:
+    """Return (conversation_path, response_path) for a prompt file."""
+    base_name = Path(prompt_file).stem
+    conversation_path = f"{LOG_DIR}/{base_name}_conversation"
+    response_path = (
+        f"{LOG_DIR}/{base_name}_{provider_name}_response_{timestamp}{suffix}"
+    )
+    return conversation_path, response_path
+
+
+@contextmanager
+def _open_logs(
+    conversation_path: str, response_path: str, timestamp: str, prompt_bytes: bytes
+) -> Iterator[LogFiles]:
+    """Open both logs and write the prompt header to the conversation log."""
+    # Open both log files *before* the API call, so that problems such as a
+    # full disk surface before a long request rather than after it. Binary
+    # mode lets streamed text be encoded once and written as bytes.
+    with (
+        open_append_log(conversation_path) as conv_f,
+        open(response_path, "wb", buffering=LOG_BUFFER_SIZE) as resp_f,
+    ):
+        _write_prompt_header(conv_f, timestamp, prompt_bytes)
+        conv_f.flush()  # Ensure prompt is written before response starts
+        yield LogFiles(conv_f, resp_f)
+
+
+def _write_prompt_header(
+    conversation: IO[bytes], timestamp: str, prompt_bytes: bytes
+) -> None:
+    # Log the prompt part to the conversation file, keeping the prompt file's
+    # bytes rather than re-encoding the decoded text
+    conversation.write(f"--- Prompt: {timestamp} ---\n".encode())
+    conversation.write(prompt_bytes)
+    conversation.write(f"\n--- Response: {timestamp} ---\n".encode())
+
+
+def _log_response(logs: LogFiles, response_text: str | None) -> None:
+    # Log a response the provider didn't stream
+    if response_text is not None:
+        data = response_text.encode()
+        logs.conversation.write(data)
+        logs.response.write(data)
+    # End the entry with a blank line, separating it from the next one
+    logs.conversation.write(b"\n\n")
+
+
+def _append_entry(conversation: IO[bytes], entry: io.BytesIO) -> None:
+    conversation.write(entry.getbuffer())
+    conversation.flush()
+
+
+def _report(
+    response_text: str | None, conversation_path: str, response_path: str
+) -> None:
+    if response_text is not None:
+        click.echo(response_text)
+    click.echo(f"Conversation appended to {conversation_path}")
+    click.echo(f"Response written to {response_path}")
+
+
+def run(
+    provider: Provider,
+    provider_name: str,
+    api_name: str,
+    prompt_file: str,
+    system_prompt_file: str,
+) -> None:
+    """
+    Read the prompt files, open the logs, call the provider, and log its
+    response.
+
+    The conversation log (LOG_DIR/<basename>_conversation) has the prompt and
+    response appended under timestamped headers; the response alone goes to
+    LOG_DIR/<basename>_<provider_name>_response_<timestamp>. Errors are reported
+    on stderr and exit with status 1.
+    """
+    # Read the main prompt
+    try:
+        prompt_bytes = read_prompt_bytes(prompt_file)
+    except OSError as exc:
+        click.echo(f"Error reading prompt file: {exc}", err=True)
+        sys.exit(1)
+
+    # Read the system prompt, reusing the cached copy if the file is unchanged
+    try:
+        system_prompt = read_system_prompt(system_prompt_file)
+    except OSError as exc:
+        click.echo(f"Error reading system prompt file: {exc}", err=True)
+        sys.exit(1)
+
+    parts = _prompt_parts(system_prompt, prompt_file, prompt_bytes)
+    os.makedirs(LOG_DIR, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d%H%M%S")
+    conversation_path, response_path = _log_paths(provider_name, prompt_file, timestamp)
+
+    try:
+        with _open_logs(
+            conversation_path, response_path, timestamp, prompt_bytes
+        ) as logs:
+            try:
+                response_text = provider(parts, logs)
+            except Exception as exc:
+                click.echo(f"\nError calling {api_name} API: {exc}", err=True)
+                sys.exit(1)
+            _log_response(logs, response_text)
+    except OSError as exc:
+        click.echo(f"Error opening or writing log files: {exc}", err=True)
+        sys.exit(1)
+
+    _report(response_text, conversation_path, response_path)
+
+
+async def run_concurrently(
+    provider: AsyncProvider,
+    provider_name: str,
+    api_name: str,
+    prompt_files: Sequence[str],
+    system_prompt_file: str,
+    concurrency: int,
+) -> None:
+    """
+    Like run, but for many prompt files sharing one system prompt, with at most
+    concurrency requests in flight.
+
+    Each prompt is logged as soon as its own response arrives, and with
+    several prompts each response log name ends in the prompt's index. A failed prompt
+    is reported without stopping the others, and the process exits with status
+    1 once they have all finished.
+    """
+    # Read the system prompt once for every prompt file
+    try:
+        system_prompt = read_system_prompt(system_prompt_file)
+    except OSError as exc:
+        click.echo(f"Error reading system prompt file: {exc}", err=True)
+        sys.exit(1)
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    # One timestamp for the whole batch. When there are several prompts, each
+    # response log also gets the prompt's position, so that prompt files with
+    # the same name (or one file given twice) don't overwrite each other's.
+    timestamp = time.strftime("%Y%m%d%H%M%S")
+    numbered = len(prompt_files) > 1
+    # Prompts with the same name share a conversation log, opened once for the
+    # batch. Each entry is built in memory and appended in one write once its
+    # response is complete, so concurrent responses never interleave there.
+    conversation_logs: dict[str, BinaryIO] = {}
+    stack = ExitStack()
+
+    async def run_one(index: int, prompt_file: str) -> bool:
+        async with semaphore:
+            try:
+                prompt_bytes = await asyncio.to_thread(read_prompt_bytes, prompt_file)
+                parts = _prompt_parts(system_prompt, prompt_file, prompt_bytes)
+            except (OSError, UnicodeDecodeError) as exc:
+                click.echo(f"Error reading prompt file {prompt_file}: {exc}", err=True)
+                return False
+
+            conversation_path, response_path = _log_paths(
+                provider_name,
+                prompt_file,
+                timestamp,
+                f"_{index:04d}" if numbered else "",
+            )
+            entry = io.BytesIO()
+            _write_prompt_header(entry, timestamp, prompt_bytes)
+            try:
+                if conversation_path not in conversation_logs:
+                    conversation_logs[conversation_path] = stack.enter_context(
+                        open_append_log(conversation_path)
+                    )
+                with open(response_path, "wb", buffering=LOG_BUFFER_SIZE) as resp_f:
+                    logs = LogFiles(entry, resp_f)
+                    try:
+                        response_text = await provider(parts, logs)
+                    except Exception as exc:
+                        click.echo(
+                            f"\nError calling {api_name} API for {prompt_file}: {exc}",
+                            err=True,
+                        )
+                        return False
+                    _log_response(logs, response_text)
+
+                # Append on a worker thread so other prompts' streams keep
+                # flowing; the file object's lock keeps entries whole
+                await asyncio.to_thread(
+                    _append_entry, conversation_logs[conversation_path], entry
+                )
+            except OSError as exc:
+                click.echo(f"Error opening or writing log files: {exc}", err=True)
+                return False
+
+        _report(response_text, conversation_path, response_path)
+        return True
+
+    with stack:
+        results = await asyncio.gather(
+            *(run_one(index, f) for index, f in enumerate(prompt_files))
+        )
+    if not all(results):
+        sys.exit(1)
@@ -1,9 +1,17 @@
-import os
-import sys
-from datetime import datetime
+from typing import Any
 
 import click
+from google.genai import types
 
+from common_cli.llm_cache import DEFAULT_CACHE_DIR, cached_call, open_cache
+from common_cli.prompts import join_system_prompt
+from common_cli.runner import (
+    LogFiles,
+    PromptParts,
+    require_env,
+    run,
+    stream_to_logs,
+)
 from gemini_common.api import get_gemini_response_via_genai
 
 
@@ -44,6 +52,22 @@ from gemini_common.api import get_gemini_response_via_genai
     default=16000,
     help="Budget for the model's 'thinking' tokens.",
 )
+@click.option(
+    "--debug",
+    is_flag=True,
+    help="Print the response's usage metadata as JSON.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Always call the API, even for a cached temperature-0 request.",
+)
+@click.option(
+    "--cache-dir",
+    default=DEFAULT_CACHE_DIR,
+    show_default=True,
+    help="Directory holding the response cache.",
+)
 def main(
     prompt_file: str,
     system_prompt_file: str,
@@ -51,67 +75,46 @@ def main(
     temperature: float,
     max_tokens: int,
     thinking_budget_tokens: int,
+    debug: bool,
+    no_cache: bool,
+    cache_dir: str,
 ) -> None:
     """
     Use the prompt text from --prompt to query the Gemini API via
     google-genai, then store both the prompt and response in a conversation
     log file, and write out a separate file containing just the response.
     """
-    # Read the prompt from the specified file
-    try:
-        with open(prompt_file, encoding="utf-8") as f:
-            prompt = f.read()
-    except OSError as exc:
-        click.echo(f"Error reading prompt file: {exc}", err=True)
-        sys.exit(1)
-
-    # Read the system prompt from the specified file
-    try:
-        with open(system_prompt_file, encoding="utf-8") as f:
-            system_prompt = f.read()
-    except OSError as exc:
-        click.echo(f"Error reading system prompt file: {exc}", err=True)
-        sys.exit(1)
+    require_env("GOOGLE_API_KEY")
+    cache = open_cache(cache_dir, no_cache, temperature)
 
-    # Make the request to Gemini
-    try:
-        response_text = get_gemini_response_via_genai(
-            prompt=prompt,
-            system_prompt=system_prompt,
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            thinking_budget_tokens=thinking_budget_tokens,
+    def send(parts: PromptParts, logs: LogFiles) -> None:
+        request: dict[str, Any] = {
+            "prompt": parts.user_prompt,
+            "system_prompt": join_system_prompt(
+                parts.system_prompt, parts.static_context
+            ),
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "thinking_budget_tokens": thinking_budget_tokens,
+        }
+        # Show and log each chunk as it arrives, or the cached response
+        on_text = stream_to_logs(logs, echo_to_terminal=True)
+        # With --debug, keep the usage metadata to print after the response
+        usages: list[types.GenerateContentResponseUsageMetadata] = []
+        cached_call(
+            cache,
+            {"provider": "gemini", **request},
+            lambda: get_gemini_response_via_genai(
+                **request, on_text=on_text, on_usage=usages.append if debug else None
+            ),
+            replay=on_text,
         )
-    except Exception as exc:
-        click.echo(f"Error calling Gemini API: {exc}", err=True)
-        sys.exit(1)
-
-    # Prepare for logging
-    os.makedirs("log", exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    base_name = os.path.splitext(os.path.basename(prompt_file))[0]
-
-    # Append the prompt and response to a conversation log
-    conversation_path = os.path.join("log", f"{base_name}_conversation")
-    try:
-        with open(conversation_path, "a", encoding="utf-8") as conv_f:
-            conv_f.write(f"{timestamp}\n")
-            conv_f.write(f"{prompt}\n")
-            conv_f.write(f"{timestamp}\n")
-            conv_f.write(f"{response_text}\n")
-    except OSError as exc:
-        click.echo(f"Error writing conversation log: {exc}", err=True)
-
-    # Write the response separately, with a timestamped filename
-    response_path = os.path.join("log", f"{base_name}_gemini_response_{timestamp}")
-    try:
-        with open(response_path, "w", encoding="utf-8") as resp_f:
-            resp_f.write(response_text)
-    except OSError as exc:
-        click.echo(f"Error writing response file: {exc}", err=True)
+        click.echo()  # End the streamed response's last line
+        for usage in usages:
+            click.echo(usage.model_dump_json())
 
-    click.echo(response_text)
+    run(send, "gemini", "Gemini", prompt_file, system_prompt_file)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,225 @@
 """Common API utilities for Gemini."""
 
+import asyncio
+import hashlib
 import os
+import queue
+import threading
+from collections.abc import AsyncIterator, Callable, Iterator
+from functools import lru_cache
 
-import click
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+
+
+# Gemini only caches contexts of at least 4096 tokens; approximate that as four
+# characters per token
+CONTEXT_CACHE_MIN_CHARS = 16384
+CONTEXT_CACHE_TTL = "3600s"
+
+# Abort a response stream when no chunk arrives for this many seconds. Thinking
+# models can go quiet for a while before the first chunk, so this is generous.
+STREAM_STALL_TIMEOUT = 300.0
+
+# Explicit context cache names, keyed by _context_cache_key(model, system_prompt).
+# None records a prompt the API refused to cache, so it isn't tried again.
+_context_caches: dict[str, str | None] = {}
+
+# Guards _context_caches and _context_cache_key_locks; held only briefly,
+# never across a network call
+_context_cache_lock = threading.Lock()
+
+# One lock per cache key, so concurrent requests sharing a system prompt create
+# one context cache between them, while requests with different system prompts
+# look up or create theirs in parallel
+_context_cache_key_locks: dict[str, threading.Lock] = {}
+
+
+@lru_cache(maxsize=4)
+def _get_client(api_key: str | None = None) -> genai.Client:
+    """
+    Return a process-wide Gemini client per API key so its connection pool is
+    reused. Without a key the client is configured from the environment.
+    """
+    return genai.Client(api_key=api_key) if api_key else genai.Client()
+
+
+def _context_cache_key(model: str, system_prompt: str) -> str:
+    """Hash (model, system prompt) into a key, also used as the cache's name."""
+    return hashlib.blake2b(
+        f"{model}\0{system_prompt}".encode(), digest_size=16
+    ).hexdigest()
+
+
+def _get_context_cache(
+    client: genai.Client, model: str, system_prompt: str
+) -> str | None:
+    """
+    Return the name of an explicit context cache holding the system prompt,
+    creating one on a miss. Returns None when the prompt is too small to cache
+    or a cache can't be found or created, in which case it should be sent
+    inline.
+    """
+    if len(system_prompt) < CONTEXT_CACHE_MIN_CHARS:
+        return None
+
+    key = _context_cache_key(model, system_prompt)
+    with _context_cache_lock:
+        if key in _context_caches:
+            return _context_caches[key]
+        key_lock = _context_cache_key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        # Another request may have finished the lookup while this one waited
+        with _context_cache_lock:
+            if key in _context_caches:
+                return _context_caches[key]
+
+        try:
+            # Reuse a live cache created by an earlier run, found by display name
+            name = next(
+                (
+                    cache.name
+                    for cache in client.caches.list()
+                    if cache.display_name == key
+                ),
+                None,
+            )
+            if name is None:
+                name = client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=key,
+                        system_instruction=system_prompt,
+                        ttl=CONTEXT_CACHE_TTL,
+                    ),
+                ).name
+        except errors.ClientError as exc:
+            # A refusal, such as a prompt under the model's minimum token
+            # count, will recur, so remember it; a rate limit may pass
+            if exc.code != 429:
+                with _context_cache_lock:
+                    _context_caches[key] = None
+            return None
+        except Exception:
+            # The cache is only an optimization, so on a server or transport
+            # error send the prompt inline and try the cache again next time
+            return None
+
+        with _context_cache_lock:
+            _context_caches[key] = name
+        return name
+
+
+def _retry_without_context_cache(
+    exc: errors.ClientError,
+    cached_content: str | None,
+    streamed: bool,
+    model: str,
+    system_prompt: str,
+) -> bool:
+    """
+    Decide whether a failed request should be resent with the system prompt
+    inline, forgetting its context cache if so. Only a cache that expired or
+    became inaccessible (404 or 403) qualifies, and only before any text was
+    passed on, so a retry never repeats output.
+    """
+    if cached_content is None or streamed or exc.code not in (403, 404):
+        return False
+    with _context_cache_lock:
+        _context_caches.pop(_context_cache_key(model, system_prompt), None)
+    return True
+
+
+@lru_cache(maxsize=8)
+def _thinking_config(thinking_budget_tokens: int) -> types.ThinkingConfig:
+    """Return a shared thinking config for the given budget; don't mutate it."""
+    return types.ThinkingConfig(thinking_budget=thinking_budget_tokens)
+
+
+def _generate_config(
+    system_prompt: str,
+    cached_content: str | None,
+    temperature: float,
+    max_tokens: int,
+    thinking_budget_tokens: int,
+) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        # A context cache already carries the system instruction
+        system_instruction=None if cached_content else system_prompt,
+        cached_content=cached_content,
+        temperature=temperature,
+        max_output_tokens=max_tokens,
+        thinking_config=_thinking_config(thinking_budget_tokens),
+    )
+
+
+def _iter_with_stall_timeout(
+    chunks: Iterator[types.GenerateContentResponse], timeout: float
+) -> Iterator[types.GenerateContentResponse]:
+    """
+    Yield chunks read on a daemon thread, raising RuntimeError when the stream
+    goes silent for longer than timeout seconds. A blocking socket read can't
+    be interrupted, so the reader thread is abandoned rather than joined.
+    """
+    received: queue.Queue[tuple[bool, object]] = queue.Queue()
+
+    def pump() -> None:
+        try:
+            for chunk in chunks:
+                received.put((False, chunk))
+        except Exception as e:
+            received.put((True, e))
+        else:
+            received.put((True, None))
+
+    threading.Thread(target=pump, daemon=True).start()
+    while True:
+        try:
+            done, item = received.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(
+                f"Gemini response stream stalled: no data for {timeout:.0f}s"
+            ) from None
+        if done:
+            if isinstance(item, Exception):
+                raise item
+            return
+        yield item  # type: ignore[misc]
+
+
+async def _aiter_with_stall_timeout(
+    chunks: AsyncIterator[types.GenerateContentResponse], timeout: float
+) -> AsyncIterator[types.GenerateContentResponse]:
+    """Async counterpart of _iter_with_stall_timeout."""
+    while True:
+        try:
+            async with asyncio.timeout(timeout):
+                chunk = await anext(chunks)
+        except StopAsyncIteration:
+            return
+        except TimeoutError:
+            raise RuntimeError(
+                f"Gemini response stream stalled: no data for {timeout:.0f}s"
+            ) from None
+        yield chunk
+
+
+# The text pieces of a streamed response, and the usage metadata of its
+# final chunk, which covers the whole response
+_StreamResult = tuple[list[str], types.GenerateContentResponseUsageMetadata | None]
+
+
+# Receives a response's aggregate usage metadata once its stream ends
+UsageCallback = Callable[[types.GenerateContentResponseUsageMetadata], None]
+
+
+def _join_chunks(result: _StreamResult, on_usage: UsageCallback | None) -> str:
+    """Join the response text from stream chunks."""
+    texts, usage_metadata = result
+    if on_usage is not None and usage_metadata:
+        on_usage(usage_metadata)
+    return "".join(texts)
 
 
 def _get_gemini_response(
@@ -15,6 +230,8 @@ def _get_gemini_response(
     temperature: float,
     max_tokens: int,
     thinking_budget_tokens: int,
+    on_usage: UsageCallback | None = None,
+    on_text: Callable[[str], None] | None = None,
 ) -> str:
     """
     Common function to get a response from Gemini using a provided client.
@@ -27,26 +244,110 @@ def _get_gemini_response(
         temperature: Generation temperature
         max_tokens: Maximum tokens to generate
         thinking_budget_tokens: Thinking budget in tokens (set to 0 to disable thinking)
+        on_usage: Called with the aggregate usage metadata once the stream ends
+        on_text: Called with each chunk's text as it arrives
     """
-    # Generate text via Gemini
-    response = client.models.generate_content(
-        model=model,
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            system_instruction=system_prompt,
-            temperature=temperature,
-            max_output_tokens=max_tokens,
-            thinking_config=types.ThinkingConfig(
-                thinking_budget=thinking_budget_tokens
+
+    streamed = False
+
+    def generate(cached_content: str | None) -> _StreamResult:
+        nonlocal streamed
+        stream = client.models.generate_content_stream(
+            model=model,
+            contents=prompt,
+            config=_generate_config(
+                system_prompt,
+                cached_content,
+                temperature,
+                max_tokens,
+                thinking_budget_tokens,
             ),
-        ),
-    )
+        )
+        # Keep only each chunk's text, read once since .text joins its parts
+        # on every access, rather than every response object until the end
+        texts: list[str] = []
+        usage_metadata = None
+        for chunk in _iter_with_stall_timeout(stream, STREAM_STALL_TIMEOUT):
+            text = chunk.text
+            if text:
+                texts.append(text)
+                if on_text is not None:
+                    streamed = True
+                    on_text(text)
+            usage_metadata = chunk.usage_metadata or usage_metadata
+        return texts, usage_metadata
+
+    # Generate text via Gemini, reading the system prompt from a context cache
+    # when possible
+    cached_content = _get_context_cache(client, model, system_prompt)
+    try:
+        result = generate(cached_content)
+    except errors.ClientError as exc:
+        if not _retry_without_context_cache(
+            exc, cached_content, streamed, model, system_prompt
+        ):
+            raise
+        result = generate(None)
+
+    return _join_chunks(result, on_usage)
+
+
+async def _get_gemini_response_async(
+    client: genai.Client,
+    prompt: str,
+    system_prompt: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    thinking_budget_tokens: int,
+    on_usage: UsageCallback | None = None,
+    on_text: Callable[[str], None] | None = None,
+) -> str:
+    """Async counterpart of _get_gemini_response, using the client's aio API."""
 
-    # Print the model dump JSON for debugging
-    click.echo(response.model_dump_json())
+    streamed = False
 
-    # Return the text from the first (and typically only) candidate
-    return response.text or ""
+    async def generate(cached_content: str | None) -> _StreamResult:
+        nonlocal streamed
+        stream = await client.aio.models.generate_content_stream(
+            model=model,
+            contents=prompt,
+            config=_generate_config(
+                system_prompt,
+                cached_content,
+                temperature,
+                max_tokens,
+                thinking_budget_tokens,
+            ),
+        )
+        # Keep only each chunk's text, read once since .text joins its parts
+        # on every access, rather than every response object until the end
+        texts: list[str] = []
+        usage_metadata = None
+        async for chunk in _aiter_with_stall_timeout(stream, STREAM_STALL_TIMEOUT):
+            text = chunk.text
+            if text:
+                texts.append(text)
+                if on_text is not None:
+                    streamed = True
+                    on_text(text)
+            usage_metadata = chunk.usage_metadata or usage_metadata
+        return texts, usage_metadata
+
+    # The context cache lookup uses the blocking API, so keep it off the loop
+    cached_content = await asyncio.to_thread(
+        _get_context_cache, client, model, system_prompt
+    )
+    try:
+        result = await generate(cached_content)
+    except errors.ClientError as exc:
+        if not _retry_without_context_cache(
+            exc, cached_content, streamed, model, system_prompt
+        ):
+            raise
+        result = await generate(None)
+
+    return _join_chunks(result, on_usage)
 
 
 def get_gemini_response_via_genai(
@@ -56,6 +357,8 @@ def get_gemini_response_via_genai(
     temperature: float,
     max_tokens: int,
     thinking_budget_tokens: int,
+    on_usage: UsageCallback | None = None,
+    on_text: Callable[[str], None] | None = None,
 ) -> str:
     """
     Uses the Gemini Developer API via the google-genai library to produce a response
@@ -68,8 +371,8 @@ def get_gemini_response_via_genai(
     if not api_key:
         raise RuntimeError("GOOGLE_API_KEY environment variable not set.")
 
-    # Create the client for Gemini
-    client = genai.Client(api_key=api_key)
+    # Reuse the shared client for this key
+    client = _get_client(api_key)
 
     return _get_gemini_response(
         client=client,
@@ -79,6 +382,8 @@ def get_gemini_response_via_genai(
         temperature=temperature,
         max_tokens=max_tokens,
         thinking_budget_tokens=thinking_budget_tokens,
+        on_usage=on_usage,
+        on_text=on_text,
     )
 
 
@@ -89,6 +394,8 @@ def get_gemini_response_via_vertex(
     temperature: float,
     max_tokens: int,
     thinking_budget_tokens: int,
+    on_usage: UsageCallback | None = None,
+    on_text: Callable[[str], None] | None = None,
 ) -> str:
     """
     Uses the Gemini models via Vertex AI to produce a response for the provided prompt.
@@ -102,9 +409,11 @@ def get_gemini_response_via_vertex(
         max_tokens: Maximum tokens to generate
         thinking_budget_tokens: Thinking budget in tokens
             (set to 0 to disable thinking)
+        on_usage: Called with the aggregate usage metadata once the stream ends
+        on_text: Called with each chunk's text as it arrives
     """
-    # Create the client for Gemini
-    client = genai.Client()
+    # Reuse the shared environment-configured client
+    client = _get_client()
 
     return _get_gemini_response(
         client=client,
@@ -114,4 +423,33 @@ def get_gemini_response_via_vertex(
         temperature=temperature,
         max_tokens=max_tokens,
         thinking_budget_tokens=thinking_budget_tokens,
+        on_usage=on_usage,
+        on_text=on_text,
+    )
+
+
+async def get_gemini_response_via_vertex_async(
+    prompt: str,
+    system_prompt: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    thinking_budget_tokens: int,
+    on_usage: UsageCallback | None = None,
+    on_text: Callable[[str], None] | None = None,
+) -> str:
+    """
+    Async variant of get_gemini_response_via_vertex, so that many prompts can
+    be sent concurrently from one event loop.
+    """
+    return await _get_gemini_response_async(
+        client=_get_client(),
+        prompt=prompt,
+        system_prompt=system_prompt,
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        thinking_budget_tokens=thinking_budget_tokens,
+        on_usage=on_usage,
+        on_text=on_text,
     )
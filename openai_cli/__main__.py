@@ -1,17 +1,24 @@
-import os
-import sys
-from datetime import datetime
+import asyncio
+from typing import Any
 
 import click
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from common_cli.llm_cache import DEFAULT_CACHE_DIR, cached_call_async, open_cache
+from common_cli.prompts import join_system_prompt
+from common_cli.runner import LogFiles, PromptParts, require_env, run_concurrently
 
 
 @click.command()
 @click.option(
     "--prompt-file",
-    type=click.Path(exists=True),
+    "prompt_files",
+    # Checked when each prompt is read, so one missing file fails only its
+    # own prompt rather than the whole batch
+    type=click.Path(dir_okay=False),
     required=True,
-    help="Path to a file containing the prompt text.",
+    multiple=True,
+    help="Path to a file containing the prompt text. Repeat to send several.",
 )
 @click.option(
     "--system-prompt-file",
@@ -37,12 +44,33 @@ from openai import OpenAI
     default=16000,
     help="Maximum tokens in the response. Defaults to 16000.",
 )
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Always call the API, even for a cached temperature-0 request.",
+)
+@click.option(
+    "--cache-dir",
+    default=DEFAULT_CACHE_DIR,
+    show_default=True,
+    help="Directory holding the response cache.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Maximum number of prompts in flight at once.",
+)
 def main(
-    prompt_file: str,
+    prompt_files: tuple[str, ...],
     system_prompt_file: str,
     model: str,
     temperature: float,
     max_tokens: int,
+    no_cache: bool,
+    cache_dir: str,
+    concurrency: int,
 ) -> None:
     """
     Use the prompt text from --prompt-file (and a system prompt from
@@ -50,60 +78,36 @@ def main(
     and response in a conversation log file, and also write out a separate
     file containing just the response.
     """
-    # Read the main prompt
-    try:
-        with open(prompt_file, encoding="utf-8") as f:
-            prompt = f.read()
-    except OSError as exc:
-        click.echo(f"Error reading prompt file: {exc}", err=True)
-        sys.exit(1)
-
-    # Read the system prompt
-    try:
-        with open(system_prompt_file, encoding="utf-8") as f:
-            system_prompt = f.read()
-    except OSError as exc:
-        click.echo(f"Error reading system prompt file: {exc}", err=True)
-        sys.exit(1)
-
-    # Call the OpenAI API
-    try:
-        response_text = get_openai_response(
-            prompt, system_prompt, model, temperature, max_tokens
+    require_env("OPENAI_API_KEY")
+    cache = open_cache(cache_dir, no_cache, temperature)
+    # OpenAI client automatically reads the API key from the OPENAI_API_KEY env var
+    client = AsyncOpenAI()
+
+    async def send(parts: PromptParts, logs: LogFiles) -> str:
+        request: dict[str, Any] = {
+            "prompt": parts.user_prompt,
+            "system_prompt": join_system_prompt(
+                parts.system_prompt, parts.static_context
+            ),
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        return await cached_call_async(
+            cache,
+            {"provider": "openai", **request},
+            lambda: get_openai_response_async(client, **request),
         )
-    except Exception as exc:
-        click.echo(f"Error calling OpenAI API: {exc}", err=True)
-        sys.exit(1)
 
-    # Write the response to stdout
-    click.echo(response_text)
-
-    # Prepare for logging
-    os.makedirs("log", exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    base_name = os.path.splitext(os.path.basename(prompt_file))[0]
-
-    # Append the prompt and response to a "conversation" log
-    conversation_path = os.path.join("log", f"{base_name}_conversation")
-    try:
-        with open(conversation_path, "a", encoding="utf-8") as conv_f:
-            conv_f.write(f"--- Prompt: {timestamp} ---\n")
-            conv_f.write(f"{prompt}\n")
-            conv_f.write(f"--- Response: {timestamp} ---\n")
-            conv_f.write(f"{response_text}\n\n")
-    except OSError as exc:
-        click.echo(f"Error writing conversation log: {exc}", err=True)
-
-    # Write the response separately, with a timestamped filename
-    response_path = os.path.join("log", f"{base_name}_openai_response_{timestamp}")
-    try:
-        with open(response_path, "w", encoding="utf-8") as resp_f:
-            resp_f.write(response_text)
-    except OSError as exc:
-        click.echo(f"Error writing response file: {exc}", err=True)
+    asyncio.run(
+        run_concurrently(
+            send, "openai", "OpenAI", prompt_files, system_prompt_file, concurrency
+        )
+    )
 
 
-def get_openai_response(
+async def get_openai_response_async(
+    client: AsyncOpenAI,
     prompt: str,
     system_prompt: str,
     model: str,
@@ -111,16 +115,13 @@ def get_openai_response(
     max_tokens: int,
 ) -> str:
     """
-    Uses the OpenAI API via the openai-python library to produce a response.
-    Requires the OPENAI_API_KEY environment variable to be set.
+    Uses the OpenAI API via the openai-python library's async client to produce
+    a response. Requires the OPENAI_API_KEY environment variable to be set.
 
     Returns the response text produced by the model.
     """
-    # OpenAI client automatically reads the API key from the OPENAI_API_KEY env var
-    client = OpenAI()
-
     try:
-        completion = client.chat.completions.create(
+        completion = await client.chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
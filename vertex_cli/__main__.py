@@ -6,23 +6,164 @@ Either run `gcloud auth application-default login` locally
 or point GOOGLE_APPLICATION_CREDENTIALS at a service-account JSON file.
 """
 
-import os
-from datetime import datetime
-from pathlib import Path
+import asyncio
+import threading
+from collections.abc import Callable
+from typing import Any, NamedTuple
 
 import click
-import vertexai  # type: ignore[import-untyped]
 
-# --- Anthropic models ---
-from anthropic import AnthropicVertex
+from common_cli.llm_cache import DEFAULT_CACHE_DIR, cached_call_async, open_cache
+from common_cli.prompts import join_system_prompt
+from common_cli.runner import (
+    AsyncProvider,
+    LogFiles,
+    PromptParts,
+    run_concurrently,
+    stream_to_logs,
+)
+
+
+class _Options(NamedTuple):
+    """The command-line options a publisher's provider is built from."""
+
+    model: str
+    temperature: float
+    max_tokens: int
+    thinking_budget: int
+    project: str
+    location: str
+    debug: bool
+    no_cache: bool
+    cache_dir: str
+    echo_to_terminal: bool
+
+
+# The (project, location) vertexai.init was last called with
+_vertex_initialized: tuple[str, str] | None = None
+_vertex_init_lock = threading.Lock()
+
+
+def _init_vertex(init: Callable[..., None], project: str, location: str) -> None:
+    """
+    Initialize the Vertex AI SDK with its vertexai.init, skipping repeat calls
+    with the same settings.
+    """
+    global _vertex_initialized
+    with _vertex_init_lock:
+        if _vertex_initialized != (project, location):
+            init(project=project, location=location)
+            _vertex_initialized = (project, location)
+
+
+# Each publisher's SDK is imported only when one of its models is requested
+
+
+def _claude_provider(opts: _Options) -> AsyncProvider:
+    # --- Anthropic models ---
+    from anthropic import AsyncAnthropicVertex
+
+    from anthropic_common.streaming import (
+        print_token_usage,
+        stream_anthropic_response_async,
+    )
+
+    client = AsyncAnthropicVertex(project_id=opts.project, region="us-east5")
+
+    async def send(parts: PromptParts, logs: LogFiles) -> None:
+        # --- stream the response ---
+        _, token_usage = await stream_anthropic_response_async(
+            client=client,
+            prompt=parts.user_prompt,
+            system_prompt=parts.system_prompt,
+            model=opts.model,
+            temperature=opts.temperature,
+            max_tokens=min(opts.max_tokens, 32000),  # Anthropic has a hard limit.
+            # Extended thinking for Claude models
+            thinking_budget_tokens=opts.thinking_budget,
+            conv_log_writer=logs.conversation,
+            resp_log_writer=logs.response,
+            echo_to_terminal=opts.echo_to_terminal,
+            collect_response=False,  # Already streamed to the log files
+            static_context=parts.static_context,
+        )
+
+        # Print token usage information, naming the prompt when several run
+        # concurrently and their blocks can't be told apart by position
+        print_token_usage(
+            token_usage, None if opts.echo_to_terminal else parts.prompt_file
+        )
+
+    return send
+
+
+def _gemini_provider(opts: _Options) -> AsyncProvider:
+    import vertexai  # type: ignore[import-untyped]
+    from google.genai import types
+
+    from gemini_common.api import get_gemini_response_via_vertex_async
+
+    # Only Gemini responses are cached
+    cache = open_cache(opts.cache_dir, opts.no_cache, opts.temperature)
+
+    async def send(parts: PromptParts, logs: LogFiles) -> None:
+        request: dict[str, Any] = {
+            "prompt": parts.user_prompt,
+            "system_prompt": join_system_prompt(
+                parts.system_prompt, parts.static_context
+            ),
+            "model": opts.model,
+            "temperature": opts.temperature,
+            "max_tokens": min(opts.max_tokens, 65535),  # Gemini has a hard limit.
+            "thinking_budget_tokens": opts.thinking_budget,
+        }
+        # Log each chunk as it arrives, or the cached response
+        on_text = stream_to_logs(logs, opts.echo_to_terminal)
+        # With --debug, keep the usage metadata to print after the response
+        usages: list[types.GenerateContentResponseUsageMetadata] = []
+
+        async def fetch() -> str:
+            _init_vertex(vertexai.init, opts.project, opts.location)
+            return await get_gemini_response_via_vertex_async(
+                **request,
+                on_text=on_text,
+                on_usage=usages.append if opts.debug else None,
+            )
+
+        await cached_call_async(
+            cache, {"provider": "vertex", **request}, fetch, replay=on_text
+        )
+        if opts.echo_to_terminal:
+            click.echo()  # End the streamed response's last line
+        for usage in usages:
+            # Name the prompt when several run and their output isn't in order
+            dump = usage.model_dump_json()
+            click.echo(
+                dump if opts.echo_to_terminal else f"{parts.prompt_file}: {dump}"
+            )
+
+    return send
+
 
-from anthropic_common.streaming import print_token_usage, stream_anthropic_response
-from gemini_common.api import get_gemini_response_via_vertex
+# Provider factories, keyed by the model-name prefixes of each publisher
+_PUBLISHERS: dict[tuple[str, ...], Callable[[_Options], AsyncProvider]] = {
+    ("claude", "publishers/anthropic"): _claude_provider,
+    ("gemini",): _gemini_provider,
+}
 
 
 # ---------- CLI ----------
 @click.command()
-@click.option("--prompt-file", type=click.Path(exists=True), required=True)
+@click.option(
+    "--prompt-file",
+    "prompt_files",
+    # Checked when each prompt is read, so one missing file fails only its
+    # own prompt rather than the whole batch
+    type=click.Path(dir_okay=False),
+    required=True,
+    multiple=True,
+    help="Path to a file containing the prompt text. Repeat to send several.",
+)
 @click.option(
     "--system-prompt-file",
     type=click.Path(exists=True),
@@ -69,8 +210,31 @@ from gemini_common.api import get_gemini_response_via_vertex
     required=True,
     help="GCP location (env var fallback).",
 )
+@click.option(
+    "--debug",
+    is_flag=True,
+    help="Print Gemini usage metadata as JSON.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Always call the API, even for a cached temperature-0 request.",
+)
+@click.option(
+    "--cache-dir",
+    default=DEFAULT_CACHE_DIR,
+    show_default=True,
+    help="Directory holding the response cache.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Maximum number of prompts in flight at once.",
+)
 def main(
-    prompt_file: str,
+    prompt_files: tuple[str, ...],
     system_prompt_file: str,
     model: str,
     temperature: float,
@@ -78,65 +242,41 @@ def main(
     thinking_budget: int,
     project: str,
     location: str,
+    debug: bool,
+    no_cache: bool,
+    cache_dir: str,
+    concurrency: int,
 ) -> None:
-    # ---------- read prompts ----------
-    prompt = Path(prompt_file).read_text(encoding="utf-8")
-    system_prompt = Path(system_prompt_file).read_text(encoding="utf-8")
-
-    # ---------- Dispatch by publisher ----------
-    if model.startswith(("claude", "publishers/anthropic")):
-        client = AnthropicVertex(project_id=project, region="us-east5")
-        max_tokens = min(max_tokens, 32000)  # Anthropic has a hard limit.
-
-        # --- stream the response ---
-        response_text, token_usage = stream_anthropic_response(
-            client=client,
-            prompt=prompt,
-            system_prompt=system_prompt,
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            # Extended thinking for Claude models
-            thinking_budget_tokens=thinking_budget,
-            conv_log_writer=None,  # We'll handle logging after
-            resp_log_writer=None,  # We'll handle logging after
-            echo_to_terminal=True,
+    make_provider = next(
+        (make for prefixes, make in _PUBLISHERS.items() if model.startswith(prefixes)),
+        None,
+    )
+    if make_provider is None:
+        raise ValueError(
+            f"Unsupported model: {model}. "
+            "Only Gemini and Claude models are supported at this time."
         )
 
-        # Print token usage information
-        print_token_usage(token_usage)
-
-    elif model.startswith("gemini"):
-        vertexai.init(project=project, location=location)
-        max_tokens = min(max_tokens, 65535)  # Gemini has a hard limit.
-
-        response_text = get_gemini_response_via_vertex(
-            prompt=prompt,
-            system_prompt=system_prompt,
+    send = make_provider(
+        _Options(
             model=model,
             temperature=temperature,
             max_tokens=max_tokens,
-            thinking_budget_tokens=thinking_budget,
+            thinking_budget=thinking_budget,
+            project=project,
+            location=location,
+            debug=debug,
+            no_cache=no_cache,
+            cache_dir=cache_dir,
+            # Concurrent responses would interleave on the terminal
+            echo_to_terminal=len(prompt_files) == 1,
         )
-
-    else:
-        raise ValueError(
-            f"Unsupported model: {model}. "
-            "Only Gemini and Claude models are supported at this time."
+    )
+    asyncio.run(
+        run_concurrently(
+            send, "vertex", "Vertex AI", prompt_files, system_prompt_file, concurrency
         )
-
-    # ---------- log exactly like other modules ----------
-    ts = datetime.now().strftime("%Y%m%d%H%M%S")
-    base = Path(prompt_file).stem
-    os.makedirs("log", exist_ok=True)
-    conv_path = Path("log") / f"{base}_conversation"
-    resp_path = Path("log") / f"{base}_vertex_response_{ts}"
-
-    with conv_path.open("a", encoding="utf-8") as conv:
-        conv.write(f"{ts}\n{prompt}\n{ts}\n{response_text}\n")
-    resp_path.write_text(response_text, encoding="utf-8")
-
-    click.echo(response_text)
+    )
 
 
 if __name__ == "__main__":